@@ -19,6 +19,7 @@ import binascii
 import contextlib
 import errno
 import logging
+import mmap
 import os
 import time
 from struct import pack
@@ -44,9 +45,11 @@ from ZODB.FileStorage.format import CorruptedDataError
 from ZODB.FileStorage.format import CorruptedError
 from ZODB.FileStorage.format import DATA_HDR
 from ZODB.FileStorage.format import DATA_HDR_LEN
+from ZODB.FileStorage.format import DATA_HDR_STRUCT
 from ZODB.FileStorage.format import DataHeader
 from ZODB.FileStorage.format import FileStorageFormatter
 from ZODB.FileStorage.format import TRANS_HDR
+from ZODB.FileStorage.format import TRANS_HDR_STRUCT
 from ZODB.FileStorage.format import TRANS_HDR_LEN
 from ZODB.FileStorage.format import TxnHeader
 from ZODB.FileStorage.fspack import FileStoragePacker
@@ -606,9 +609,8 @@ class FileStorage(
             pos = self._pos
             here = pos + self._tfile.tell() + self._thl
             self._tindex[oid] = here
-            new = DataHeader(oid, self._tid, old, pos, 0, len(data))
-
-            self._tfile.write(new.asString())
+            self._tfile.write(
+                DATA_HDR_STRUCT.pack(oid, self._tid, old, pos, 0, len(data)))
             self._tfile.write(data)
 
             # Check quota
@@ -636,8 +638,8 @@ class FileStorage(
             pos = self._pos
             here = pos + self._tfile.tell() + self._thl
             self._tindex[oid] = here
-            new = DataHeader(oid, self._tid, old, pos, 0, 0)
-            self._tfile.write(new.asString())
+            self._tfile.write(
+                DATA_HDR_STRUCT.pack(oid, self._tid, old, pos, 0, 0))
             self._tfile.write(z64)
 
             # Check quota
@@ -661,7 +663,7 @@ class FileStorage(
         # the same, 0 is returned.  Why the discrepancy?
         self._file.seek(tpos)
         h = self._file.read(TRANS_HDR_LEN)
-        tid, tl, status, ul, dl, el = unpack(TRANS_HDR, h)
+        tid, tl, status, ul, dl, el = TRANS_HDR_STRUCT.unpack(h)
         status = as_text(status)
         self._file.read(ul + dl + el)
         tend = tpos + tl + 8
@@ -739,9 +741,8 @@ class FileStorage(
                 dlen = len(data)
 
             # Write the recovery data record
-            new = DataHeader(oid, serial, old, self._pos, 0, dlen)
-
-            self._tfile.write(new.asString())
+            self._tfile.write(
+                DATA_HDR_STRUCT.pack(oid, serial, old, self._pos, 0, dlen))
 
             # Finally, write the data or a backpointer.
             if data is None:
@@ -1604,143 +1605,177 @@ def read_index(file, name, index, tindex, stop=b'\377'*8,
     seek = file.seek
     seek(0, 2)
     file_size = file.tell()
-    fmt = TempFormatter(file)
 
-    if file_size:
-        if file_size < start:
-            raise FileStorageFormatError(file.name)
-        seek(0)
-        if read(4) != packed_version:
-            raise FileStorageFormatError(name)
-    else:
+    if not file_size:
         if not read_only:
             file.write(packed_version)
         return 4, z64, ltid
+    if file_size < start:
+        raise FileStorageFormatError(file.name)
 
     index_get = index.get
 
+    # Scan through a read-only memory map when we can, so that checking
+    # the magic number and walking the records don't cost a seek and a
+    # read system call apiece.
+    mm = _map_file(file)
+    if mm is not None:
+        read = mm.read
+        seek = mm.seek
+
+    # Truncation is deferred until the map is closed, since some
+    # platforms can't truncate a file that's mapped.
+    truncate = None
+
     pos = start
-    seek(start)
     tid = b'\0' * 7 + b'\1'
 
-    while 1:
-        # Read the transaction record
-        h = read(TRANS_HDR_LEN)
-        if not h:
-            break
-        if len(h) != TRANS_HDR_LEN:
-            if not read_only:
-                logger.warning('%s truncated at %s', name, pos)
-                seek(pos)
-                file.truncate()
-            break
-
-        tid, tl, status, ul, dl, el = unpack(TRANS_HDR, h)
-        status = as_text(status)
+    try:
+        seek(0)
+        if read(4) != packed_version:
+            raise FileStorageFormatError(name)
+        seek(start)
 
-        if tid <= ltid:
-            logger.warning("%s time-stamp reduction at %s", name, pos)
-        ltid = tid
-
-        if pos+(tl+8) > file_size or status=='c':
-            # Hm, the data were truncated or the checkpoint flag wasn't
-            # cleared.  They may also be corrupted,
-            # in which case, we don't want to totally lose the data.
-            if not read_only:
-                logger.warning("%s truncated, possibly due to damaged"
-                               " records at %s", name, pos)
-                _truncate(file, name, pos)
-            break
-
-        if status not in ' up':
-            logger.warning('%s has invalid status, %s, at %s',
-                           name, status, pos)
-
-        if tl < TRANS_HDR_LEN + ul + dl + el:
-            # We're in trouble. Find out if this is bad data in the
-            # middle of the file, or just a turd that Win 9x dropped
-            # at the end when the system crashed.
-            # Skip to the end and read what should be the transaction length
-            # of the last transaction.
-            seek(-8, 2)
-            rtl = u64(read(8))
-            # Now check to see if the redundant transaction length is
-            # reasonable:
-            if file_size - rtl < pos or rtl < TRANS_HDR_LEN:
-                logger.critical('%s has invalid transaction header at %s',
-                                name, pos)
+        while 1:
+            # Read the transaction record
+            h = read(TRANS_HDR_LEN)
+            if not h:
+                break
+            if len(h) != TRANS_HDR_LEN:
                 if not read_only:
-                    logger.warning(
-                         "It appears that there is invalid data at the end of "
-                         "the file, possibly due to a system crash.  %s "
-                         "truncated to recover from bad data at end." % name)
-                    _truncate(file, name, pos)
+                    logger.warning('%s truncated at %s', name, pos)
+                    truncate = _truncate_tail
                 break
-            else:
-                if recover:
-                    return pos, None, None
-                panic('%s has invalid transaction header at %s', name, pos)
 
-        if tid >= stop:
-            break
+            # The status is left as bytes; decoding it for every
+            # transaction just to compare it is wasted work.
+            tid, tl, status, ul, dl, el = TRANS_HDR_STRUCT.unpack(h)
 
-        tpos = pos
-        tend = tpos + tl
+            if tid <= ltid:
+                logger.warning("%s time-stamp reduction at %s", name, pos)
+            ltid = tid
 
-        if status == 'u':
-            # Undone transaction, skip it
-            seek(tend)
-            h = u64(read(8))
-            if h != tl:
-                if recover:
-                    return tpos, None, None
-                panic('%s has inconsistent transaction length at %s',
-                      name, pos)
-            pos = tend + 8
-            continue
+            if pos+(tl+8) > file_size or status == b'c':
+                # Hm, the data were truncated or the checkpoint flag wasn't
+                # cleared.  They may also be corrupted,
+                # in which case, we don't want to totally lose the data.
+                if not read_only:
+                    logger.warning("%s truncated, possibly due to damaged"
+                                   " records at %s", name, pos)
+                    truncate = _truncate
+                break
 
-        pos = tpos + TRANS_HDR_LEN + ul + dl + el
-        while pos < tend:
-            # Read the data records for this transaction
-            h = fmt._read_data_header(pos)
-            dlen = h.recordlen()
-            tindex[h.oid] = pos
+            if status not in b' up':
+                logger.warning('%s has invalid status, %s, at %s',
+                               name, as_text(status), pos)
 
-            if pos + dlen > tend or h.tloc != tpos:
-                if recover:
-                    return tpos, None, None
-                panic("%s data record exceeds transaction record at %s",
-                      name, pos)
+            if tl < TRANS_HDR_LEN + ul + dl + el:
+                # We're in trouble. Find out if this is bad data in the
+                # middle of the file, or just a turd that Win 9x dropped
+                # at the end when the system crashed.
+                # Skip to the end and read what should be the transaction
+                # length of the last transaction.
+                seek(-8, 2)
+                rtl = u64(read(8))
+                # Now check to see if the redundant transaction length is
+                # reasonable:
+                if file_size - rtl < pos or rtl < TRANS_HDR_LEN:
+                    logger.critical('%s has invalid transaction header at %s',
+                                    name, pos)
+                    if not read_only:
+                        logger.warning(
+                            "It appears that there is invalid data at the end "
+                            "of the file, possibly due to a system crash.  %s "
+                            "truncated to recover from bad data at end."
+                            % name)
+                        truncate = _truncate
+                    break
+                else:
+                    if recover:
+                        return pos, None, None
+                    panic('%s has invalid transaction header at %s', name, pos)
 
-            if index_get(h.oid, 0) != h.prev:
-                if h.prev:
+            if tid >= stop:
+                break
+
+            tpos = pos
+            tend = tpos + tl
+
+            if status == b'u':
+                # Undone transaction, skip it
+                seek(tend)
+                h = u64(read(8))
+                if h != tl:
                     if recover:
                         return tpos, None, None
-                    logger.error("%s incorrect previous pointer at %s",
-                                 name, pos)
+                    panic('%s has inconsistent transaction length at %s',
+                          name, pos)
+                pos = tend + 8
+                continue
+
+            pos = tpos + TRANS_HDR_LEN + ul + dl + el
+            while pos < tend:
+                # Read the data records for this transaction.  Only the
+                # header fields are needed, so unpack them directly rather
+                # than building a DataHeader (and reading its backpointer)
+                # for every record.  When mapped, they're unpacked in
+                # place, without a seek or a copy.
+                if mm is not None and pos + DATA_HDR_LEN <= file_size:
+                    h = DATA_HDR_STRUCT.unpack_from(mm, pos)
                 else:
-                    logger.warning("%s incorrect previous pointer at %s",
-                                   name, pos)
+                    seek(pos)
+                    h = read(DATA_HDR_LEN)
+                    if len(h) != DATA_HDR_LEN:
+                        raise CorruptedDataError(None, h, pos)
+                    h = DATA_HDR_STRUCT.unpack(h)
+                oid, _, prev, tloc, vlen, plen = h
+                if vlen:
+                    raise ValueError(
+                        "Non-zero version length. Versions aren't supported.")
+                dlen = DATA_HDR_LEN + (plen or 8)
+                tindex[oid] = pos
 
-            pos += dlen
+                if pos + dlen > tend or tloc != tpos:
+                    if recover:
+                        return tpos, None, None
+                    panic("%s data record exceeds transaction record at %s",
+                          name, pos)
+
+                if index_get(oid, 0) != prev:
+                    if prev:
+                        if recover:
+                            return tpos, None, None
+                        logger.error("%s incorrect previous pointer at %s",
+                                     name, pos)
+                    else:
+                        logger.warning("%s incorrect previous pointer at %s",
+                                       name, pos)
 
-        if pos != tend:
-            if recover:
-                return tpos, None, None
-            panic("%s data records don't add up at %s",name,tpos)
+                pos += dlen
 
-        # Read the (intentionally redundant) transaction length
-        seek(pos)
-        h = u64(read(8))
-        if h != tl:
-            if recover:
-                return tpos, None, None
-            panic("%s redundant transaction length check failed at %s",
-                  name, pos)
-        pos += 8
-
-        index.update(tindex)
-        tindex.clear()
+            if pos != tend:
+                if recover:
+                    return tpos, None, None
+                panic("%s data records don't add up at %s",name,tpos)
+
+            # Read the (intentionally redundant) transaction length
+            seek(pos)
+            h = u64(read(8))
+            if h != tl:
+                if recover:
+                    return tpos, None, None
+                panic("%s redundant transaction length check failed at %s",
+                      name, pos)
+            pos += 8
+
+            index.update(tindex)
+            tindex.clear()
+    finally:
+        if mm is not None:
+            mm.close()
+
+    if truncate is not None:
+        truncate(file, name, pos)
 
     # Caution:  fsIndex doesn't have an efficient __nonzero__ or __len__.
     # That's why we do try/except instead.  fsIndex.maxKey() is fast.
@@ -1753,6 +1788,32 @@ def read_index(file, name, index, tindex, stop=b'\377'*8,
     return pos, maxoid, ltid
 
 
+# Not all platforms (or Pythons) can advise the kernel about access patterns
+_MADV_SEQUENTIAL = getattr(mmap, 'MADV_SEQUENTIAL', None)
+
+
+def _map_file(file):
+    """Return a read-only memory map of an open file, for scanning it.
+
+    None is returned if the file can't be mapped, for example because
+    it's too big for the address space.  Where supported, the kernel is
+    told the map will be read sequentially, so it can read ahead
+    aggressively and free pages once the scan has passed them.
+    """
+    try:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, EnvironmentError, OverflowError, ValueError):
+        return None
+    if _MADV_SEQUENTIAL is not None:
+        mm.madvise(_MADV_SEQUENTIAL)
+    return mm
+
+
+def _truncate_tail(file, name, pos):
+    file.seek(pos)
+    file.truncate()
+
+
 def _truncate(file, name, pos):
     file.seek(0, 2)
     file_size = file.tell()
@@ -2106,7 +2167,7 @@ class UndoSearch(object):
         self.pos -= u64(self.file.read(8)) + 8
         self.file.seek(self.pos)
         h = self.file.read(TRANS_HDR_LEN)
-        tid, tl, status, ul, dl, el = unpack(TRANS_HDR, h)
+        tid, tl, status, ul, dl, el = TRANS_HDR_STRUCT.unpack(h)
         status = as_text(status)
         if status == 'p':
             self.stop = 1
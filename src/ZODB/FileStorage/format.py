@@ -118,6 +118,9 @@ TRANS_HDR_LEN = 23
 DATA_HDR_LEN = 42
 assert struct.calcsize(TRANS_HDR) == TRANS_HDR_LEN
 assert struct.calcsize(DATA_HDR) == DATA_HDR_LEN
+# precompiled header structs, so hot paths skip the format cache lookup
+TRANS_HDR_STRUCT = struct.Struct(TRANS_HDR)
+DATA_HDR_STRUCT = struct.Struct(DATA_HDR)
 
 logger = logging.getLogger('ZODB.FileStorage.format')
 
@@ -233,7 +236,7 @@ class FileStorageFormatter(object):
                 self.fail(pos, "data record has back pointer and data")
 
 def DataHeaderFromString(s):
-    return DataHeader(*struct.unpack(DATA_HDR, s))
+    return DataHeader(*DATA_HDR_STRUCT.unpack(s))
 
 class DataHeader(object):
     """Header for a data record."""
@@ -253,14 +256,14 @@ class DataHeader(object):
         self.back = 0 # default
 
     def asString(self):
-        return struct.pack(DATA_HDR, self.oid, self.tid, self.prev,
-                           self.tloc, 0, self.plen)
+        return DATA_HDR_STRUCT.pack(self.oid, self.tid, self.prev,
+                                    self.tloc, 0, self.plen)
 
     def recordlen(self):
         return DATA_HDR_LEN + (self.plen or 8)
 
 def TxnHeaderFromString(s):
-    res = TxnHeader(*struct.unpack(TRANS_HDR, s))
+    res = TxnHeader(*TRANS_HDR_STRUCT.unpack(s))
     if PY3:
         res.status = res.status.decode('ascii')
     return res
@@ -281,8 +284,8 @@ class TxnHeader(object):
         assert elen >= 0
 
     def asString(self):
-        s = struct.pack(TRANS_HDR, self.tid, self.tlen, as_bytes(self.status),
-                        self.ulen, self.dlen, self.elen)
+        s = TRANS_HDR_STRUCT.pack(self.tid, self.tlen, as_bytes(self.status),
+                                  self.ulen, self.dlen, self.elen)
         return b"".join(map(as_bytes, [s, self.user, self.descr, self.ext]))
 
     def headerlen(self):
@@ -52,11 +52,15 @@ from ZODB._compat import _protocol
 
 # convert between numbers and six-byte strings
 
+_NUM_STRUCT = struct.Struct(">Q")
+_NUM_PACK = _NUM_STRUCT.pack
+_NUM_UNPACK = _NUM_STRUCT.unpack
+
 def num2str(n):
-    return struct.pack(">Q", n)[2:]
+    return _NUM_PACK(n)[2:]
 
 def str2num(s):
-    return struct.unpack(">Q", b"\000\000" + s)[0]
+    return _NUM_UNPACK(b"\000\000" + s)[0]
 
 def prefix_plus_one(s):
     num = str2num(s)
@@ -175,8 +179,25 @@ class fsIndex(object):
         return r
 
     def update(self, mapping):
-        for k, v in mapping.items():
-            self[ensure_bytes(k)] = v
+        # Group the items by prefix first, so each bucket is looked up
+        # once and filled with a single bucket update rather than an
+        # item at a time.
+        updates = {}
+        for key, value in mapping.items():
+            key = ensure_bytes(key)
+            treekey = key[:6]
+            suffixes = updates.get(treekey)
+            if suffixes is None:
+                suffixes = updates[treekey] = {}
+            suffixes[key[6:]] = num2str(value)
+
+        data = self._data
+        for treekey, suffixes in six.iteritems(updates):
+            tree = data.get(treekey)
+            if tree is None:
+                data[treekey] = fsBucket(suffixes)
+            else:
+                tree.update(suffixes)
 
     def has_key(self, key):
         v = self.get(key, self)
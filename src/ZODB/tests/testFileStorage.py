@@ -268,6 +268,42 @@ class FileStorageTests(
         else:
             self.fail("expected CorruptedError")
 
+    def checkTruncatedTailIsRemovedOnOpen(self, map_file=True):
+        oid = self._storage.new_oid()
+        revid = self._dostore(oid)
+        self._storage.close()
+        os.remove('FileStorageTests.fs.index')
+        size = os.path.getsize('FileStorageTests.fs')
+
+        # Leave part of a transaction header at the end of the file,
+        # as a crash in the middle of a write might.
+        with open('FileStorageTests.fs', 'ab') as f:
+            f.write(b'\0' * 7)
+
+        if map_file:
+            self.open()
+        else:
+            module = sys.modules['ZODB.FileStorage.FileStorage']
+            with util.mock.patch.object(module, '_map_file',
+                                        return_value=None):
+                self.open()
+
+        self.assertEqual(os.path.getsize('FileStorageTests.fs'), size)
+        self.assertEqual(self._storage.getSize(), size)
+        self.assertEqual(load_current(self._storage, oid)[1], revid)
+
+    def checkTruncatedTailIsRemovedOnOpenWithoutMap(self):
+        self.checkTruncatedTailIsRemovedOnOpen(False)
+
+    def checkBadMagicNumberOnOpen(self):
+        from ZODB.FileStorage.FileStorage import FileStorageFormatError
+        self._dostore()
+        self._storage.close()
+        os.remove('FileStorageTests.fs.index')
+        with open('FileStorageTests.fs', 'r+b') as f:
+            f.write(b'XXXX')
+        self.assertRaises(FileStorageFormatError, self.open, read_only=True)
+
     def check_record_iternext(self):
 
         db = DB(self._storage)